@@ -1,6 +1,5 @@
 import json
 import os
-import pickle
 from datetime import datetime
 from itertools import count
 from time import sleep, time
@@ -30,9 +29,15 @@ RESUME_DIR = "resumes"
 HISTORY_FILE = "history.json"
 SETTINGS_FILE = "settings.json"
 RESUMES_FILE = "resumes.json"
-COOKIES_FILE_BASE = "dice_cookies.pkl"
+COOKIES_FILE = "cookies.json"
+LEGACY_COOKIES_FILE_BASE = "dice_cookies.pkl"
 RATE_LIMIT_FILE = "rate_limits.json"
 
+# Cookie freshness windows (seconds)
+COOKIE_VALIDATION_TTL = 1800  # Trust a validated session this long without probing the dashboard
+COOKIE_REFRESH_MARGIN = 2 * COOKIE_VALIDATION_TTL  # Re-validate and re-save when a cookie expires within this window
+LOGGED_IN_SELECTOR = "a[href*='logout']"  # Only rendered for a signed-in user
+
 # Ensure directories and files exist
 os.makedirs(RESUME_DIR, exist_ok=True)
 for file in [HISTORY_FILE, SETTINGS_FILE, RESUMES_FILE, RATE_LIMIT_FILE]:
@@ -63,34 +68,130 @@ def save_rate_limits(limits):
         json.dump(limits, f, indent=2)
 
 # Cookie handling functions
-def load_cookies(driver, username):
-    cookie_file = f"{username}_{COOKIES_FILE_BASE}"
-    if os.path.exists(cookie_file):
-        try:
-            with open(cookie_file, "rb") as f:
-                cookies = pickle.load(f)
-            for cookie in cookies:
-                driver.add_cookie(cookie)
-            return True
-        except Exception as e:
-            print(f"Failed to load cookies: {e}")
-    return False
+def load_cookie_store():
+    try:
+        with open(COOKIES_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-def save_cookies(driver, username):
-    cookie_file = f"{username}_{COOKIES_FILE_BASE}"
+def save_cookie_store(store):
+    # Write atomically and owner-only: the store holds every user's session tokens
+    tmp_file = f"{COOKIES_FILE}.tmp"
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(store, f, indent=2)
+    os.replace(tmp_file, COOKIES_FILE)
+
+# Returns "fresh" (validated recently, nothing expiring soon), "stale" (needs a
+# dashboard check) or None when there are no usable cookies
+def load_cookies(driver, username):
+    session = load_cookie_store().get(username)
+    if not session:
+        return None
+    now = time()
+    cookies = [c for c in session.get("cookies", []) if c.get("expiry") is None or c["expiry"] > now]
+    if not cookies:
+        return None
+    try:
+        for cookie in cookies:
+            driver.add_cookie(cookie)
+    except Exception as e:
+        print(f"Failed to load cookies: {e}")
+        return None
+    # Freshness hinges only on the auth cookies recorded when the session was
+    # validated; any of them missing, expired or close to expiry means re-check
+    auth_cookies = session.get("auth_cookies")
+    if not auth_cookies:
+        return "stale"
+    by_name = {c["name"]: c for c in cookies}
+    for name in auth_cookies:
+        cookie = by_name.get(name)
+        if cookie is None or (cookie.get("expiry") is not None and cookie["expiry"] - now < COOKIE_REFRESH_MARGIN):
+            return "stale"
+    last_validated = session.get("last_validated")
+    if last_validated and now - last_validated < COOKIE_VALIDATION_TTL:
+        return "fresh"
+    return "stale"
+
+# validated: this run proved the session works. new_session: the cookies come
+# from a fresh login, so the previously recorded auth cookies no longer apply.
+def save_cookies(driver, username, validated=False, new_session=False):
     try:
-        with open(cookie_file, "wb") as f:
-            pickle.dump(driver.get_cookies(), f)
+        now = time()
+        cookies = driver.get_cookies()
+        store = load_cookie_store()
+        previous = {} if new_session else store.get(username, {})
+        auth_cookies = previous.get("auth_cookies", [])
+        last_validated = previous.get("last_validated")
+        if validated:
+            names = {c["name"] for c in cookies}
+            long_lived = [c["name"] for c in cookies if c.get("expiry") is None or c["expiry"] - now > COOKIE_REFRESH_MARGIN]
+            auth_cookies = sorted({name for name in auth_cookies if name in names} | set(long_lived))
+            last_validated = now
+        store[username] = {
+            "cookies": cookies,
+            "auth_cookies": auth_cookies,
+            "saved_at": now,
+            "last_validated": last_validated
+        }
+        save_cookie_store(store)
     except Exception as e:
         print(f"Failed to save cookies: {e}")
 
+def invalidate_cookies(username):
+    store = load_cookie_store()
+    if username in store:
+        store[username]["last_validated"] = None
+        save_cookie_store(store)
+
 def delete_cookies(username):
-    cookie_file = f"{username}_{COOKIES_FILE_BASE}"
-    if os.path.exists(cookie_file):
-        os.remove(cookie_file)
+    deleted = False
+    store = load_cookie_store()
+    if username in store:
+        del store[username]
+        save_cookie_store(store)
+        deleted = True
+    legacy_file = f"{username}_{LEGACY_COOKIES_FILE_BASE}"
+    if os.path.exists(legacy_file):
+        os.remove(legacy_file)
+        deleted = True
+    if deleted:
         return f"Cookies deleted for {username}"
     return f"No cookies found for {username}"
 
+# Login helpers
+def is_logged_in(driver, wait):
+    # Return as soon as the page shows either state; a timeout falls back to the URL
+    try:
+        wait.until(EC.any_of(
+            EC.url_contains("login"),
+            EC.presence_of_element_located((By.ID, "email")),
+            EC.presence_of_element_located((By.CSS_SELECTOR, LOGGED_IN_SELECTOR))
+        ))
+    except TimeoutException:
+        pass
+    return "login" not in driver.current_url and not driver.find_elements(By.ID, "email")
+
+# Opens the apply form; returns the resume radio, or True if Dice sent us to login
+def open_apply_form(driver, wait, job_url):
+    driver.get(job_url)
+    apply_container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "dhi-wc-apply-button")))
+    wait.until(EC.text_to_be_present_in_element((By.CSS_SELECTOR, "dhi-wc-apply-button"), "Apply Now"))
+    driver.execute_script("arguments[0].shadowRoot.querySelector('button').click();", apply_container)
+    return wait.until(EC.any_of(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, "input#upload-resume-radio")),
+        EC.url_contains("login")
+    ))
+
+def login_with_password(driver, wait, username, password):
+    driver.get("https://www.dice.com/dashboard/login")
+    email_elem = wait.until(EC.presence_of_element_located((By.ID, "email")))
+    email_elem.send_keys(username)
+    password_elem = driver.find_element(By.ID, "password")
+    password_elem.send_keys(password + Keys.RETURN)
+    wait.until(lambda d: "dashboard" in d.current_url and "login" not in d.current_url)
+
 # Main application function
 def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, resume_name: str, location: str, employment_type: str, prefer_remote: bool, cache_path: str = "", wait_s: int = 5):
     if not all([username, password, keywords, resume_name, employment_type]):
@@ -157,25 +258,28 @@ def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, r
     except Exception as e:
         return f"Error: Failed to initialize Chrome driver: {e}", 0
     wait = WebDriverWait(driver, wait_s)
+    relogin_attempted = False
+    session_lost = False
+    session_verified = False
 
     driver.get("https://www.dice.com")
-    if load_cookies(driver, username):
+    cookie_state = load_cookies(driver, username)
+    if cookie_state == "fresh":
+        output_log.append("Logged in with cookies.")
+    elif cookie_state:
         driver.get("https://www.dice.com/dashboard")
-        try:
-            wait.until(EC.presence_of_element_located((By.ID, "email")))
-            output_log.append("Cookies invalid, attempting manual login.")
-        except TimeoutException:
+        if is_logged_in(driver, wait):
             output_log.append("Logged in with cookies.")
+            session_verified = True
+            save_cookies(driver, username, validated=True)
+        else:
+            output_log.append("Cookies invalid, attempting manual login.")
     if "Logged in with cookies" not in "\n".join(output_log):
-        driver.get("https://www.dice.com/dashboard/login")
         try:
-            email_elem = wait.until(EC.presence_of_element_located((By.ID, "email")))
-            email_elem.send_keys(username)
-            password_elem = driver.find_element(By.ID, "password")
-            password_elem.send_keys(password + Keys.RETURN)
-            wait.until(EC.url_contains("dashboard"))
+            login_with_password(driver, wait, username, password)
             output_log.append("Logged in successfully.")
-            save_cookies(driver, username)
+            session_verified = True
+            save_cookies(driver, username, validated=True, new_session=True)
         except Exception as e:
             output_log.append(f"Login failed: {e}")
             driver.quit()
@@ -236,12 +340,28 @@ def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, r
                 continue
 
             try:
-                driver.get(job_url)
-                apply_container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "dhi-wc-apply-button")))
-                wait.until(EC.text_to_be_present_in_element((By.CSS_SELECTOR, "dhi-wc-apply-button"), "Apply Now"))
-                driver.execute_script("arguments[0].shadowRoot.querySelector('button').click();", apply_container)
-
-                resume_radio = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input#upload-resume-radio")))
+                resume_radio = open_apply_form(driver, wait, job_url)
+                if "login" in driver.current_url:
+                    invalidate_cookies(username)
+                    if relogin_attempted:
+                        output_log.append("Session lost again after re-login, stopping.")
+                        session_lost = True
+                        break
+                    relogin_attempted = True
+                    output_log.append("Session expired, logging in again.")
+                    try:
+                        login_with_password(driver, wait, username, password)
+                    except Exception as e:
+                        output_log.append(f"Login failed: {e}")
+                        session_lost = True
+                        break
+                    session_verified = True
+                    save_cookies(driver, username, validated=True, new_session=True)
+                    resume_radio = open_apply_form(driver, wait, job_url)
+                    if "login" in driver.current_url:
+                        output_log.append("Session lost again after re-login, stopping.")
+                        session_lost = True
+                        break
                 try:
                     daily_limit = driver.find_element(By.CSS_SELECTOR, "div[id^=googleCaptchaSection]")
                     if daily_limit.is_displayed():
@@ -257,6 +377,8 @@ def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, r
                 apply_now_button.click()
                 wait.until(EC.staleness_of(apply_now_button))
                 output_log.append(f"Applied to {job_title} at {company_name}.")
+                session_verified = True
+                relogin_attempted = False
                 all_applied_job_ids.add(job_id)
                 session_data["applied_jobs"].append({
                     "job_id": job_id,
@@ -284,6 +406,9 @@ def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, r
                 })
                 continue
 
+        if session_lost:
+            break
+
     session_data["end_time"] = datetime.now().strftime("%Y-%m-%d %H:%M")
     if session_data["applied_jobs"]:
         user_history["sessions"].append(session_data)
@@ -292,6 +417,8 @@ def apply_to_dice(username: str, password: str, keywords: str, blacklist: str, r
     with open(HISTORY_FILE, "w") as f:
         json.dump(history, f, indent=2)
 
+    if not session_lost:
+        save_cookies(driver, username, validated=session_verified)
     driver.quit()
     return "\n".join(output_log), len(session_data["applied_jobs"])
 
@@ -620,7 +747,7 @@ with gr.Blocks(title="Auto Apply to Dice Jobs") as demo:
                 try:
                     driver = webdriver.Chrome(service=service, options=options)  # Updated WebDriver initialization
                     driver.get("https://www.dice.com/dashboard")
-                    save_cookies(driver, username)
+                    save_cookies(driver, username, new_session=True)
                     driver.quit()
                     return f"Cookies saved for {username}. Please log in manually first."
                 except Exception as e: